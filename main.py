@@ -1,12 +1,18 @@
 import os
 import io
+import asyncio
 import json
-import uuid
 import textwrap
 import re
-import requests
+import threading
+import functools
+import concurrent.futures
+import aiohttp
 import emoji
+import numpy as np
+from collections import namedtuple
 from datetime import datetime, timezone
+from functools import lru_cache
 
 from PIL import Image, ImageDraw, ImageFont
 
@@ -30,10 +36,16 @@ if not DISCORD_TOKEN:
 CONFIG_FILE = "config.json"
 FONTS_DIR = "fonts"
 TWEMOJI_DIR = "twemoji"
+AVATAR_DIR = "avatars"
+TWEMOJI_URL = "https://raw.githubusercontent.com/twitter/twemoji/master/assets/72x72/{codepoint}.png"
 WORD_LIMIT = 200
 MAX_CHARS = 2000  # Discord-like char cap
+# zlib level for the sent PNG: 1 is far cheaper than the default 6 and flat UI
+# backgrounds still compress well; 0 (stored) would upload the raw pixels as-is
+PNG_COMPRESS_LEVEL = 1
 
 os.makedirs(TWEMOJI_DIR, exist_ok=True)
+os.makedirs(AVATAR_DIR, exist_ok=True)
 os.makedirs(FONTS_DIR, exist_ok=True)  # ensure fonts dir exists for user to drop files
 
 FONT_PATHS = {
@@ -61,39 +73,142 @@ def save_config(cfg):
     with open(CONFIG_FILE, "w", encoding="utf-8") as f:
         json.dump(cfg, f, indent=2)
 
-def fetch_url_bytes(url, timeout=8):
+# Guild settings live in memory; config.json is only read at startup and
+# written behind, with writes inside CONFIG_SAVE_DELAY seconds coalesced.
+CONFIG = load_config()
+CONFIG_SAVE_DELAY = 1.0
+_SAVE_TASK = None
+# True while CONFIG holds changes that are not yet on disk
+_CONFIG_DIRTY = False
+
+async def _debounced_save():
+    global _SAVE_TASK, _CONFIG_DIRTY
+    await asyncio.sleep(CONFIG_SAVE_DELAY)
+    _SAVE_TASK = None
+    # cleared as the snapshot is taken, so later changes mark it dirty again
+    _CONFIG_DIRTY = False
     try:
-        r = requests.get(url, timeout=timeout)
-        if r.status_code == 200:
-            return r.content
+        await asyncio.to_thread(save_config, dict(CONFIG))
     except Exception:
-        pass
-    return None
+        _CONFIG_DIRTY = True
+        raise
+
+def schedule_config_save():
+    global _SAVE_TASK, _CONFIG_DIRTY
+    _CONFIG_DIRTY = True
+    if _SAVE_TASK is None:
+        _SAVE_TASK = asyncio.create_task(_debounced_save())
+
+# Shared aiohttp session, owned by the bot (see ScreenshotBot.setup_hook / close)
+AIOHTTP = None
+
+async def _fetch_response(url):
+    """
+    Returns (status, body); body is None unless status is 200, and status is
+    None when the request itself failed.
+    """
+    if AIOHTTP is None or AIOHTTP.closed:
+        # only outside the bot's lifetime (before setup_hook / after close)
+        return None, None
+    try:
+        async with AIOHTTP.get(url) as r:
+            if r.status == 200:
+                return r.status, await r.read()
+            return r.status, None
+    except Exception:
+        return None, None
+
+async def _fetch_async(url):
+    return (await _fetch_response(url))[1]
+
+# Codepoints twemoji answered 404 for (e.g. newer Unicode emoji). Never retried
+# in this process; other failures are transient and retried on the next use.
+_TWEMOJI_MISSING = set()
+
+def _twemoji_codepoint(char):
+    return "-".join(f"{ord(c):x}" for c in char)
+
+def _write_file_atomic(path, data):
+    # write next to the target and swap it in, so readers never see a partial file
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+@lru_cache(maxsize=2048)
+def _decoded_twemoji(codepoint):
+    """
+    Returns the emoji as a decoded RGBA Image, decoding each PNG at most once
+    per process. Only reads TWEMOJI_DIR; downloading is left to prefetch_twemoji.
+    Raises LookupError if the emoji is not on disk. Errors are not cached,
+    so an emoji downloaded by a later prefetch is picked up.
+    """
+    if codepoint in _TWEMOJI_MISSING:
+        raise LookupError(codepoint)
+    try:
+        return Image.open(os.path.join(TWEMOJI_DIR, f"{codepoint}.png")).convert("RGBA")
+    except Exception:
+        raise LookupError(codepoint)
+
+async def prefetch_twemoji(content):
+    """
+    Downloads any emoji in content that is not yet in TWEMOJI_DIR, concurrently,
+    so the synchronous renderer only ever reads them from disk.
+    """
+    missing = []
+    for codepoint in {_twemoji_codepoint(ch) for ch in content if ch in emoji.EMOJI_DATA}:
+        if codepoint in _TWEMOJI_MISSING:
+            continue
+        if not os.path.exists(os.path.join(TWEMOJI_DIR, f"{codepoint}.png")):
+            missing.append(codepoint)
+    if not missing:
+        return
+    results = await asyncio.gather(*(
+        _fetch_response(TWEMOJI_URL.format(codepoint=cp)) for cp in missing
+    ))
+    for codepoint, (status, b) in zip(missing, results):
+        if status == 404:
+            _TWEMOJI_MISSING.add(codepoint)
+        elif b:
+            try:
+                _write_file_atomic(os.path.join(TWEMOJI_DIR, f"{codepoint}.png"), b)
+            except Exception:
+                pass
 
 def fetch_twemoji(char):
     """
-    Returns a PIL Image for the emoji (RGBA) or None if not found.
-    Caches PNGs under TWEMOJI_DIR by codepoint.
+    Returns a PIL Image for the emoji (RGBA) from TWEMOJI_DIR or None if not found.
     """
-    codepoint = "-".join(f"{ord(c):x}" for c in char)
-    local_path = os.path.join(TWEMOJI_DIR, f"{codepoint}.png")
-    if os.path.exists(local_path):
-        try:
-            return Image.open(local_path).convert("RGBA")
-        except Exception:
-            pass
-    url = f"https://raw.githubusercontent.com/twitter/twemoji/master/assets/72x72/{codepoint}.png"
-    b = fetch_url_bytes(url)
-    if b:
-        try:
-            with open(local_path, "wb") as f:
-                f.write(b)
-            return Image.open(io.BytesIO(b)).convert("RGBA")
-        except Exception:
-            pass
-    return None
+    try:
+        return _decoded_twemoji(_twemoji_codepoint(char))
+    except LookupError:
+        return None
+
+@lru_cache(maxsize=512)
+def get_twemoji_scaled(codepoint, size):
+    """
+    Returns the emoji already resized to (size, size), ready to paste.
+    Callers must not modify the returned image; it is shared between renders.
+    Raises LookupError if the emoji is unavailable.
+    """
+    # BILINEAR: at ~22px LANCZOS is visually indistinguishable and much slower
+    return _decoded_twemoji(codepoint).resize((size, size), Image.BILINEAR)
+
+@lru_cache(maxsize=64)
+def get_twemoji_strip(codepoint, size, run_len):
+    """
+    Returns run_len copies of the scaled emoji side by side.
+    Raises LookupError if the emoji is unavailable.
+    """
+    em_img = get_twemoji_scaled(codepoint, size)
+    if run_len == 1:
+        return em_img
+    strip = Image.new("RGBA", (size * run_len, size), (0,0,0,0))
+    for n in range(run_len):
+        strip.paste(em_img, (n * size, 0))
+    return strip
 
-def load_font(style="regular", size=22):
+def _load_font_uncached(style="regular", size=22):
     path = FONT_PATHS.get(style, FONT_PATHS["regular"])
     try:
         return ImageFont.truetype(path, size)
@@ -101,14 +216,72 @@ def load_font(style="regular", size=22):
         # Fallback to a default PIL font with approximate metrics
         return ImageFont.load_default()
 
+# Fonts are only read from while drawing, so one instance per (style, size) is shared
+load_font = lru_cache(maxsize=64)(_load_font_uncached)
+
+# Warm the cache with the sizes used by render_discord_message
+_PRELOAD_FONTS = (("bold", 24), ("regular", 18), ("regular", 22))
+for _style, _size in _PRELOAD_FONTS:
+    load_font(_style, _size)
+
+# Text measurement cache. Fonts are looked up by an int key so the cache never
+# has to hash PIL font objects; _FONTS also keeps them alive so ids stay unique.
+_DUMMY_DRAW = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+_FONTS = {}
+
+def _font_key(font):
+    key = id(font)
+    _FONTS.setdefault(key, font)
+    return key
+
+@lru_cache(maxsize=4096)
+def _measure(font_key, s):
+    return _DUMMY_DRAW.textlength(s, font=_FONTS[font_key])
+
+@lru_cache(maxsize=8)
+def _circle_mask(size):
+    m = Image.new("L", size, 0)
+    ImageDraw.Draw(m).ellipse((0,0,size[0],size[1]), fill=255)
+    return np.asarray(m)
+
 def circle_crop_image(pil_img, size=(64,64)):
-    pil_img = pil_img.convert("RGBA").resize(size)
-    mask = Image.new("L", size, 0)
-    draw = ImageDraw.Draw(mask)
-    draw.ellipse((0,0,size[0],size[1]), fill=255)
-    out = Image.new("RGBA", size, (0,0,0,0))
-    out.paste(pil_img, (0,0), mask)
-    return out
+    arr = np.asarray(pil_img.convert("RGBA").resize(size)).copy()
+    arr[:,:,3] = np.minimum(arr[:,:,3], _circle_mask(size))
+    return Image.fromarray(arr, "RGBA")
+
+def _avatar_path(user_id, key):
+    return os.path.join(AVATAR_DIR, f"{user_id}_{key}.png")
+
+async def fetch_avatar(user_id, key, url):
+    """
+    Makes sure the avatar is in AVATAR_DIR, keyed by user id and avatar hash,
+    downloading it only on a miss. Returns True if it is available.
+    """
+    path = _avatar_path(user_id, key)
+    if os.path.exists(path):
+        return True
+    b = await _fetch_async(url)
+    if not b:
+        return False
+    try:
+        _write_file_atomic(path, b)
+        return True
+    except Exception:
+        return False
+
+@lru_cache(maxsize=256)
+def _cropped_avatar(user_id, key):
+    # raises on failure so that lru_cache never remembers a missing avatar
+    return circle_crop_image(Image.open(_avatar_path(user_id, key)), (64,64))
+
+def get_avatar_image(user_id, key):
+    """
+    Returns the circle-cropped 64x64 avatar from AVATAR_DIR, or None.
+    """
+    try:
+        return _cropped_avatar(user_id, key)
+    except Exception:
+        return None
 
 def get_member_role_color(member: discord.Member):
     """
@@ -130,128 +303,233 @@ def get_member_role_color(member: discord.Member):
         pass
     return None
 
-# ---------------- MENTION PREPROCESS ----------------
-def preprocess_mentions(content: str, msg: discord.Message, guild: discord.Guild):
-    out = content
+# ---------------- MENTION PARSING ----------------
+# A run of message content: kind is "text" or "mention". Text segments with
+# color None use the theme's text color; mentions carry their resolved color.
+Segment = namedtuple("Segment", "kind text color")
+
+MENTION_COLOR = (88,101,242)
+EVERYONE_COLOR = (250,166,26)
+
+@lru_cache(maxsize=128)
+def _mention_pattern(keys):
+    # longest first so overlapping raw forms never shadow each other
+    return re.compile("|".join(re.escape(k) for k in sorted(keys, key=len, reverse=True)))
+
+def parse_content(msg: discord.Message, guild: discord.Guild):
+    """
+    Splits the message content into Segments, resolving mentions to their
+    display label and color in the same pass.
+    """
+    repl = {
+        "@everyone": Segment("mention", "@everyone", EVERYONE_COLOR),
+        "@here": Segment("mention", "@here", EVERYONE_COLOR),
+    }
     try:
         for role in msg.role_mentions:
-            raw = f"<@&{role.id}>"
-            replacement = f"{{{{ROLE:{role.id}:{role.name}}}}}"
-            out = out.replace(raw, replacement)
+            resolved = guild.get_role(role.id) if guild else None
+            color = MENTION_COLOR if (not resolved or getattr(resolved.color, "value", 0) == 0) else resolved.color.to_rgb()
+            repl[f"<@&{role.id}>"] = Segment("mention", f"@{role.name}", color)
     except Exception:
         pass
     try:
         for user in msg.mentions:
-            raw1 = f"<@!{user.id}>"
-            raw2 = f"<@{user.id}>"
-            replacement = f"{{{{USER:{user.id}:{user.display_name}}}}}"
-            out = out.replace(raw1, replacement).replace(raw2, replacement)
+            seg = Segment("mention", f"@{user.display_name}", MENTION_COLOR)
+            repl[f"<@!{user.id}>"] = seg
+            repl[f"<@{user.id}>"] = seg
     except Exception:
         pass
-    out = out.replace("@everyone", "{{EVERYONE}}").replace("@here", "{{HERE}}")
-    return out
+    content = msg.content
+    segments = []
+    pos = 0
+    for m in _mention_pattern(frozenset(repl)).finditer(content):
+        if m.start() > pos:
+            segments.append(Segment("text", content[pos:m.start()], None))
+        segments.append(repl[m.group(0)])
+        pos = m.end()
+    if pos < len(content):
+        segments.append(Segment("text", content[pos:], None))
+    return segments
 
 # ---------------- RENDERING ----------------
-def _render_line_with_tokens(img, draw, line, x, y, max_width, font, default_color, guild):
-    tokens = re.split(r"(\{\{.*?\}\})", line)
+def _render_line(img, draw, line, x, y, font, default_color, font_size, line_advance):
+    font_key = _font_key(font)
     cur_x = x
-    for t in tokens:
-        if not t:
+    for seg in line:
+        color = seg.color or default_color
+        if seg.kind == "mention":
+            draw.text((cur_x, y), seg.text, font=font, fill=color)
+            cur_x += _measure(font_key, seg.text)
             continue
-        if t.startswith("{{ROLE:"):
-            try:
-                _, rid, name = t.strip("{}").split(":", 2)
-                role = guild.get_role(int(rid))
-                color = (88, 101, 242) if (not role or getattr(role.color, "value", 0) == 0) else role.color.to_rgb()
-                draw.text((cur_x, y), f"@{name}", font=font, fill=color)
-                cur_x += draw.textlength(f"@{name}", font=font)
-            except Exception:
-                draw.text((cur_x, y), t, font=font, fill=default_color)
-                cur_x += draw.textlength(t, font=font)
-        elif t.startswith("{{USER:"):
-            try:
-                _, uid, name = t.strip("{}").split(":", 2)
-                draw.text((cur_x, y), f"@{name}", font=font, fill=(88,101,242))
-                cur_x += draw.textlength(f"@{name}", font=font)
-            except Exception:
-                draw.text((cur_x, y), t, font=font, fill=default_color)
-                cur_x += draw.textlength(t, font=font)
-        elif t == "{{EVERYONE}}":
-            draw.text((cur_x, y), "@everyone", font=font, fill=(250,166,26))
-            cur_x += draw.textlength("@everyone", font=font)
-        elif t == "{{HERE}}":
-            draw.text((cur_x, y), "@here", font=font, fill=(250,166,26))
-            cur_x += draw.textlength("@here", font=font)
+        t = seg.text
+        if t.isascii():
+            # no emoji possible: draw the whole run in one call
+            draw.text((cur_x, y), t, font=font, fill=color)
+            cur_x += _measure(font_key, t)
+            continue
+        # regular text that may contain emoji; text between emoji is drawn in one call
+        plain = ""
+        j = 0
+        while j < len(t):
+            ch = t[j]
+            # render emoji via twemoji if available
+            if ch in emoji.EMOJI_DATA:
+                # repeated emoji are pasted as a single pre-tiled strip
+                run = 1
+                while j + run < len(t) and t[j + run] == ch:
+                    run += 1
+                try:
+                    em_img = get_twemoji_strip(_twemoji_codepoint(ch), font_size, run)
+                except LookupError:
+                    em_img = None
+                if em_img:
+                    if plain:
+                        draw.text((cur_x, y), plain, font=font, fill=color)
+                        cur_x += _measure(font_key, plain)
+                        plain = ""
+                    img.paste(em_img, (int(cur_x), int(y)), em_img)
+                    cur_x += font_size * run
+                    j += run
+                    continue
+            plain += ch
+            j += 1
+        if plain:
+            draw.text((cur_x, y), plain, font=font, fill=color)
+            cur_x += _measure(font_key, plain)
+    return y + line_advance
+
+def _append_segment(line, seg):
+    # merge with the previous segment when it would be drawn the same way
+    if line and line[-1].kind == seg.kind and line[-1].color == seg.color:
+        line[-1] = Segment(seg.kind, line[-1].text + seg.text, seg.color)
+    else:
+        line.append(seg)
+
+def _split_words(segments):
+    """
+    Yields the words of each source line as lists of Segments. Words only
+    break at spaces, so a mention glued to text stays on one line with it.
+    """
+    words = [[]]
+    for seg in segments:
+        if seg.kind != "text":
+            words[-1].append(seg)
+            continue
+        for li, part in enumerate(seg.text.split("\n")):
+            if li:
+                yield words
+                words = [[]]
+            for wi, w in enumerate(part.split(" ")):
+                if wi:
+                    words.append([])
+                if w:
+                    words[-1].append(Segment("text", w, seg.color))
+    yield words
+
+def _segment_width(font_key, seg, font_size):
+    # emoji in text are pasted at font_size (see _render_line), not drawn with the font
+    if seg.kind != "text" or seg.text.isascii():
+        return _measure(font_key, seg.text)
+    width = 0.0
+    plain = ""
+    for ch in seg.text:
+        if ch in emoji.EMOJI_DATA:
+            width += font_size
         else:
-            # regular text that may contain emoji
-            for ch in t:
-                # render emoji via twemoji if available
-                if ch in emoji.EMOJI_DATA:
-                    em_img = fetch_twemoji(ch)
-                    if em_img:
-                        # size the emoji to font.size if possible
-                        try:
-                            font_size = getattr(font, "size", 22)
-                        except Exception:
-                            font_size = 22
-                        em_img = em_img.resize((font_size, font_size), Image.LANCZOS)
-                        img.paste(em_img, (int(cur_x), int(y)), em_img)
-                        cur_x += font_size
-                        continue
-                draw.text((cur_x, y), ch, font=font, fill=default_color)
-                cur_x += draw.textlength(ch, font=font)
-    return y + getattr(font, "size", 22) + 6
-
-def draw_wrapped_with_placeholders(img, draw, text, x, y, max_width, font, default_color, guild):
-    lines = text.split("\n")
-    current_y = y
-    for line in lines:
-        words = line.split(" ")
-        cur_line = ""
+            plain += ch
+    return width + (_measure(font_key, plain) if plain else 0.0)
+
+def wrap_lines(segments, font, max_width):
+    """
+    Splits segments into the lines that fit max_width, breaking over-long words.
+    Run before drawing so the canvas can be allocated at its final height.
+    """
+    font_key = _font_key(font)
+    font_size = getattr(font, "size", 22)
+    space = Segment("text", " ", None)
+    space_width = _measure(font_key, " ")
+    out = []
+    for words in _split_words(segments):
+        cur_line = None
+        cur_width = 0.0
         for w in words:
-            if draw.textlength(w, font=font) > max_width:
+            # each word is measured once; the line width is accumulated, not re-measured
+            w_width = sum(_segment_width(font_key, seg, font_size) for seg in w)
+            if w_width > max_width:
+                if cur_line is not None:
+                    out.append(cur_line)
                 # break very long word into chunks
-                chunk = ""
-                for ch in w:
-                    if draw.textlength(chunk + ch, font=font) <= max_width:
-                        chunk += ch
-                    else:
-                        current_y = _render_line_with_tokens(img, draw, chunk, x, current_y, max_width, font, default_color, guild)
-                        chunk = ch
-                if chunk:
-                    cur_line = chunk + " "
-                else:
-                    cur_line = ""
+                chunk = []
+                chunk_width = 0.0
+                for seg in w:
+                    for ch in seg.text:
+                        if seg.kind == "text" and ch in emoji.EMOJI_DATA:
+                            ch_width = font_size
+                        else:
+                            ch_width = _measure(font_key, ch)
+                        if chunk and chunk_width + ch_width > max_width:
+                            out.append(chunk)
+                            chunk = []
+                            chunk_width = 0.0
+                        _append_segment(chunk, Segment(seg.kind, ch, seg.color))
+                        chunk_width += ch_width
+                cur_line = chunk or None
+                cur_width = chunk_width
+            elif cur_line is None:
+                cur_line = list(w)
+                cur_width = w_width
+            elif cur_width + space_width + w_width <= max_width:
+                _append_segment(cur_line, space)
+                for seg in w:
+                    _append_segment(cur_line, seg)
+                cur_width += space_width + w_width
             else:
-                test = (cur_line + w + " ").rstrip()
-                if draw.textlength(test, font=font) <= max_width:
-                    cur_line = (cur_line + w + " ").rstrip() + " "
-                else:
-                    current_y = _render_line_with_tokens(img, draw, cur_line, x, current_y, max_width, font, default_color, guild)
-                    cur_line = w + " "
-        if cur_line:
-            current_y = _render_line_with_tokens(img, draw, cur_line, x, current_y, max_width, font, default_color, guild)
+                out.append(cur_line)
+                cur_line = list(w)
+                cur_width = w_width
+        if cur_line is not None:
+            out.append(cur_line)
+    return out
+
+def draw_wrapped_lines(img, draw, lines, x, y, font, default_color):
+    # emoji are sized to font.size if possible
+    font_size = getattr(font, "size", 22)
+    line_advance = font_size + 6
+    current_y = y
+    for line in lines:
+        current_y = _render_line(img, draw, line, x, current_y, font, default_color, font_size, line_advance)
     return current_y
 
-def render_discord_message(author, avatar_url, content, timestamp, mode, member, guild):
+def draw_plain_lines(draw, lines, x, y, font, default_color):
+    """
+    Draws lines with no mentions or emoji through a single multiline_text call,
+    keeping the same line advance as draw_wrapped_lines.
+    """
+    line_advance = getattr(font, "size", 22) + 6
+    # multiline_text advances by the height of "A" plus spacing
+    spacing = line_advance - draw.textbbox((0, 0), "A", font=font)[3]
+    text = "\n".join("".join(seg.text for seg in line) for line in lines)
+    draw.multiline_text((x, y), text, font=font, fill=default_color, spacing=spacing)
+    return y + len(lines) * line_advance
+
+def render_discord_message(author, avatar_key, segments, timestamp, mode, member):
+    """
+    Renders the screenshot. Performs no network I/O: avatar_key is the
+    (user_id, avatar hash) of an avatar already stored by fetch_avatar, and
+    emoji are only read from TWEMOJI_DIR, so any not fetched by
+    prefetch_twemoji are drawn as plain text.
+    """
     bg = (54,57,63) if mode=="dark" else (255,255,255)
     text_color = (220,221,222) if mode=="dark" else (0,0,0)
-    img = Image.new("RGBA", (800, 400), bg)
+    body_font = load_font("regular", 22)
+    lines = wrap_lines(segments, body_font, 680)
+    height = 90 + len(lines) * (getattr(body_font, "size", 22) + 6) + 20
+    img = Image.new("RGBA", (800, height), bg)
     draw = ImageDraw.Draw(img)
     # avatar
-    av_bytes = None
-    if avatar_url:
-        try:
-            av_bytes = fetch_url_bytes(avatar_url)
-        except Exception:
-            av_bytes = None
-    if av_bytes:
-        try:
-            av_img = Image.open(io.BytesIO(av_bytes))
-            av_img = circle_crop_image(av_img, (64,64))
-            img.paste(av_img, (20,20), av_img)
-        except Exception:
-            pass
+    av_img = get_avatar_image(*avatar_key) if avatar_key else None
+    if av_img:
+        img.alpha_composite(av_img, (20,20))
     role_color = get_member_role_color(member) or (255,255,255)
     draw.text((100,20), author, font=load_font("bold", 24), fill=role_color)
     # Format timestamp in a cross-platform way, remove leading zero
@@ -261,18 +539,38 @@ def render_discord_message(author, avatar_url, content, timestamp, mode, member,
         ts = str(timestamp)
     draw.text((100,50), ts, font=load_font("regular", 18), fill=(150,150,150))
     y = 90
-    y = draw_wrapped_with_placeholders(img, draw, content, 100, y, 680, load_font("regular", 22), text_color, guild)
-    final = img.crop((0,0,800,y+20))
-    path = f"screenshot_{uuid.uuid4().hex}.png"
-    final.save(path)
-    return path
+    if all(seg.kind == "text" and not any(ch in emoji.EMOJI_DATA for ch in seg.text) for seg in segments):
+        # plain text: let PIL lay out the already wrapped lines in one call
+        draw_plain_lines(draw, lines, 100, y, body_font, text_color)
+    else:
+        draw_wrapped_lines(img, draw, lines, 100, y, body_font, text_color)
+    # Encoded straight into memory; the image is sent once and never kept
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", optimize=False, compress_level=PNG_COMPRESS_LEVEL)
+    buf.seek(0)
+    return buf
 
 # ---------------- BOT ----------------
 intents = discord.Intents.default()
 intents.message_content = True
 intents.guilds = True
 intents.members = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+
+class ScreenshotBot(commands.Bot):
+    async def setup_hook(self):
+        global AIOHTTP
+        AIOHTTP = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=8))
+
+    async def close(self):
+        await super().close()
+        if AIOHTTP is not None and not AIOHTTP.closed:
+            await AIOHTTP.close()
+
+bot = ScreenshotBot(command_prefix="!", intents=intents)
+
+# Rendering is CPU-bound PIL work, so it runs off the event loop. A single worker
+# because the cached FreeType fonts and emoji images are shared between renders.
+RENDER_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
 
 @bot.event
 async def on_ready():
@@ -309,38 +607,42 @@ async def ss(ctx):
         await ctx.send(f"⚠️ Message too long (limit: {MAX_CHARS} characters).", delete_after=5)
         return
 
-    cfg = load_config()
-    guild_cfg = cfg.get(str(ctx.guild.id), {"mode": "light"})
+    guild_cfg = CONFIG.get(str(ctx.guild.id), {"mode": "light"})
     mode = guild_cfg.get("mode", "light")
 
-    content = preprocess_mentions(target.content, target, ctx.guild)
+    segments = parse_content(target, ctx.guild)
     # Use UTC-aware formatting (target.created_at is usually aware)
     timestamp = target.created_at.astimezone(timezone.utc).strftime("%I:%M %p").lstrip("0")
-    # Resolve avatar URL safely
+    # Resolve avatar URL and hash safely
     avatar_attr = getattr(target.author, "display_avatar", None)
-    avatar_url = None
+    avatar_url = avatar_key = None
     try:
-        avatar_url = avatar_attr.url if avatar_attr else None
+        if avatar_attr:
+            avatar_url = avatar_attr.url
+            avatar_key = (target.author.id, avatar_attr.key)
     except Exception:
-        avatar_url = None
+        avatar_url = avatar_key = None
 
-    img_path = render_discord_message(
+    if avatar_key:
+        has_avatar, _ = await asyncio.gather(
+            fetch_avatar(*avatar_key, avatar_url),
+            prefetch_twemoji(target.content),
+        )
+    else:
+        has_avatar = False
+        await prefetch_twemoji(target.content)
+
+    loop = asyncio.get_running_loop()
+    buf = await loop.run_in_executor(RENDER_POOL, functools.partial(
+        render_discord_message,
         target.author.display_name,
-        avatar_url,
-        content,
+        avatar_key if has_avatar else None,
+        segments,
         timestamp,
         mode,
-        target.author,
-        ctx.guild
-    )
-    try:
-        await ctx.send(f"📸 Screenshot generated by {ctx.author.mention}", file=discord.File(img_path))
-    finally:
-        try:
-            if os.path.exists(img_path):
-                os.remove(img_path)
-        except Exception:
-            pass
+        target.author
+    ))
+    await ctx.send(f"📸 Screenshot generated by {ctx.author.mention}", file=discord.File(buf, filename="screenshot.png"))
 
 # ---------- SLASH COMMANDS ----------
 @bot.tree.command(name="setup", description="Setup screenshot mode for this server")
@@ -350,25 +652,25 @@ async def ss(ctx):
     app_commands.Choice(name="Dark Mode", value="dark")
 ])
 async def setup(interaction: discord.Interaction, mode: app_commands.Choice[str]):
-    cfg = load_config()
-    cfg[str(interaction.guild.id)] = {"mode": mode.value}
-    save_config(cfg)
+    CONFIG[str(interaction.guild.id)] = {"mode": mode.value}
+    schedule_config_save()
     await interaction.response.send_message(f"✅ Setup complete! Mode set to **{mode.name}**.", delete_after=2)
 
 @bot.tree.command(name="lightmode", description="Switch screenshots to light mode")
 async def lightmode(interaction: discord.Interaction):
-    cfg = load_config()
-    cfg[str(interaction.guild.id)] = {"mode": "light"}
-    save_config(cfg)
+    CONFIG[str(interaction.guild.id)] = {"mode": "light"}
+    schedule_config_save()
     await interaction.response.send_message("☀️ Switched to **light mode** for screenshots.", delete_after=2)
 
 @bot.tree.command(name="darkmode", description="Switch screenshots to dark mode")
 async def darkmode(interaction: discord.Interaction):
-    cfg = load_config()
-    cfg[str(interaction.guild.id)] = {"mode": "dark"}
-    save_config(cfg)
+    CONFIG[str(interaction.guild.id)] = {"mode": "dark"}
+    schedule_config_save()
     await interaction.response.send_message("🌙 Switched to **dark mode** for screenshots.", delete_after=2)
 
 # Run
 if __name__ == "__main__":
     bot.run(DISCORD_TOKEN)
+    # flush a change that was still waiting in the debounce window
+    if _CONFIG_DIRTY:
+        save_config(CONFIG)